@@ -1,13 +1,19 @@
 import streamlit as st
-import requests
-from bs4 import BeautifulSoup
+import httpx
+import orjson
+from selectolax.parser import HTMLParser
 import os
 import time
 import random
+from email.utils import parsedate_to_datetime
 from urllib.parse import urlparse
 import zipfile
 import io
 import shutil
+import tempfile
+import threading
+from contextlib import suppress
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 # Several Sci-Hub domains occasionally return HTTP 403.  Using a variety
 # of user agents and falling back to the r.jina.ai proxy helps bypass this.
@@ -20,14 +26,171 @@ USER_AGENTS = [
     "Chrome/112.0 Safari/537.36",
 ]
 
+# Default and upper limit for the number of DOIs downloaded concurrently.
+# The work is almost entirely network-bound, so threads overlap the
+# latency of individual requests.
+MAX_WORKERS = 8
+MAX_WORKERS_LIMIT = 16
 
-def fetch_with_bypass(url, headers):
+# At most this many DOIs are worked on against the same mirror at once.
+# A DOI starts on the first mirror with a free slot, so once one mirror is
+# busy the remaining workers move on to the others instead of queueing.
+MAX_DOIS_PER_MIRROR = 4
+
+# Places on a Sci-Hub page where the PDF link may be, in the order they
+# are tried, with the attribute holding the link.
+PDF_LINK_SELECTORS = [
+    ('iframe[src]', 'src'),
+    ('embed[src]', 'src'),
+    ('a[href$=".pdf"]', 'href'),
+    ('div#download a[href]', 'href'),
+]
+
+
+@st.cache_resource
+def get_http_client():
+    """
+    Create an HTTP client shared by all downloads.
+    Pooled connections avoid a new TCP/TLS handshake for every request to
+    the same mirror, and with HTTP/2 concurrent downloads from one mirror
+    are multiplexed over a single connection. Cached as a resource so
+    reruns reuse it.
+    """
+    return httpx.Client(
+        http2=True,
+        limits=httpx.Limits(max_connections=64, max_keepalive_connections=32),
+        timeout=30,
+        follow_redirects=True,
+    )
+
+
+CLIENT = get_http_client()
+
+
+@st.cache_resource
+def get_mirror_slots():
+    """
+    Create the count of downloads in progress per mirror host, and the
+    condition guarding it that is notified whenever a slot is released.
+    Cached as a resource so every session and rerun shares the same limits.
+    """
+    return {}, threading.Condition()
+
+
+def acquire_mirror(mirrors):
+    """
+    Wait until any of `mirrors` has a free slot and take it, preferring
+    earlier mirrors when several are free.
+    Returns the mirror; the caller must pass it to release_mirror.
+    """
+    in_use, condition = get_mirror_slots()
+    with condition:
+        while True:
+            for mirror in mirrors:
+                host = urlparse(mirror).netloc
+                if in_use.get(host, 0) < MAX_DOIS_PER_MIRROR:
+                    in_use[host] = in_use.get(host, 0) + 1
+                    return mirror
+            condition.wait()
+
+
+def release_mirror(mirror):
+    """Free the slot taken on `mirror` and wake any workers waiting for one."""
+    in_use, condition = get_mirror_slots()
+    with condition:
+        in_use[urlparse(mirror).netloc] -= 1
+        condition.notify_all()
+
+# DOIs may be given as https://doi.org/ links; path separators in a DOI are
+# replaced so it can be used as a file name.
+DOI_URL_PREFIX = 'https://doi.org/'
+DOI_FILENAME_TABLE = str.maketrans({'/': '_', '\\': '_'})
+
+# PDFs are written to disk in chunks of this size rather than held in memory.
+# They are streamed to a file with this suffix and renamed once complete, so
+# an existing .pdf is always a finished download.
+DOWNLOAD_CHUNK_SIZE = 64 * 1024
+PARTIAL_SUFFIX = ".part"
+
+# Rate-limited (429/503) requests are retried with exponential backoff and
+# jitter, up to MAX_RETRIES times and never waiting longer than BACKOFF_CAP.
+RETRY_STATUS_CODES = (429, 503)
+MAX_RETRIES = 3
+BACKOFF_CAP = 60
+
+
+def normalize_doi(doi):
+    """Strip whitespace and any https://doi.org/ prefix from a DOI."""
+    return doi.strip().removeprefix(DOI_URL_PREFIX)
+
+def pdf_filename(output_dir, doi):
+    """Return the path a DOI's PDF is saved to. The DOI must be normalised."""
+    return os.path.join(output_dir, f"{doi.translate(DOI_FILENAME_TABLE)}.pdf")
+
+def retry_after_seconds(response):
+    """
+    Return how long the server asked us to wait, in seconds, based on the
+    Retry-After or X-RateLimit-Reset headers, or None if it gave no guidance.
+    """
+    retry_after = response.headers.get('Retry-After')
+    if retry_after:
+        if retry_after.strip().isdigit():
+            return float(retry_after)
+        try:
+            return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+        except (TypeError, ValueError):
+            pass
+    reset = response.headers.get('X-RateLimit-Reset')
+    if reset:
+        try:
+            reset = float(reset)
+        except ValueError:
+            return None
+        # Some servers send an epoch timestamp, others the seconds remaining
+        return max(0.0, reset - time.time()) if reset > 1e9 else reset
+    return None
+
+def get_with_backoff(url, headers=None, stream=False, delay_range=(3, 7), log=st.write):
+    """
+    GET a URL, backing off on 429/503 responses.
+    The wait doubles on each attempt from delay_range[0], plus a random
+    jitter of up to the width of delay_range, unless the server says how
+    long to wait. Failed or dropped connections are retried immediately;
+    timeouts are not retried, so an unresponsive mirror fails fast and the
+    next one is tried.
+    """
+    attempt = 0
+    while True:
+        try:
+            request = CLIENT.build_request("GET", url, headers=headers)
+            response = CLIENT.send(request, stream=stream)
+        except (httpx.ConnectError, httpx.RemoteProtocolError):
+            if attempt >= MAX_RETRIES:
+                raise
+            attempt += 1
+            continue
+        if response.status_code not in RETRY_STATUS_CODES or attempt >= MAX_RETRIES:
+            return response
+        delay = retry_after_seconds(response)
+        if delay is None:
+            delay = min(BACKOFF_CAP, delay_range[0] * 2 ** attempt)
+            delay += random.uniform(0, delay_range[1] - delay_range[0])
+        elif delay > BACKOFF_CAP:
+            # The server wants us to stay away longer than we are willing to wait
+            return response
+        response.close()
+        log(f"Rate limited by {urlparse(url).netloc} (status {response.status_code}). Waiting {delay:.2f} seconds...")
+        time.sleep(delay)
+        attempt += 1
+
+def fetch_with_bypass(url, headers, stream=False, delay_range=(3, 7), log=st.write):
     """Fetch a URL and retry via r.jina.ai if a 403 Forbidden is returned."""
-    response = requests.get(url, headers=headers, timeout=30)
+    response = get_with_backoff(url, headers, stream=stream, delay_range=delay_range, log=log)
     if response.status_code == 403:
+        response.close()
         # r.jina.ai fetches the resource server-side and returns the content
         proxy_url = f"https://r.jina.ai/{url}"
-        response = requests.get(proxy_url, headers=headers, timeout=30)
+        response = get_with_backoff(proxy_url, headers, stream=stream, delay_range=delay_range, log=log)
     return response
 
 def clear_papers_directory(output_dir="papers"):
@@ -36,34 +199,56 @@ def clear_papers_directory(output_dir="papers"):
         shutil.rmtree(output_dir)
         st.write("Previous downloads cleared.")
 
-def try_download_with_mirrors(doi, mirrors, output_dir="papers", delay_range=(3, 7)):
+def try_download_with_mirrors(doi, mirrors, output_dir="papers", delay_range=(3, 7), log=st.write):
     """
     Attempt to download a paper for a given DOI using the provided list of Sci-Hub mirrors.
+    Each mirror is tried once, taking whichever untried mirror has a free
+    slot first, in list order when several do.
+    Messages are passed to `log`.
     Returns True if any mirror succeeds, otherwise False.
     """
-    for mirror in mirrors:
-        st.write(f"Trying mirror: {mirror}")
-        success = download_paper(doi, output_dir=output_dir, sci_hub_url=mirror)
+    remaining = list(mirrors)
+    while remaining:
+        mirror = acquire_mirror(remaining)
+        remaining.remove(mirror)
+        log(f"Trying mirror: {mirror}")
+        try:
+            success = download_paper(
+                doi, output_dir=output_dir, sci_hub_url=mirror, delay_range=delay_range, log=log
+            )
+        finally:
+            release_mirror(mirror)
         if success:
             return True
         else:
-            st.write(f"Mirror {mirror} failed for DOI: {doi}. Trying next mirror...")
-            delay = random.uniform(delay_range[0], delay_range[1])
-            st.write(f"Waiting {delay:.2f} seconds before next mirror...")
-            time.sleep(delay)
-    st.write("All Sci-Hub mirrors failed. Checking open access sources...")
-    return download_open_access(doi, output_dir=output_dir)
-
-def download_paper(doi, output_dir="papers", sci_hub_url="https://sci-hub.box/"):
+            # Rate limiting is backed off per request, so a different
+            # mirror can be tried straight away.
+            log(f"Mirror {mirror} failed for DOI: {doi}. Trying next mirror...")
+    log("All Sci-Hub mirrors failed. Checking open access sources...")
+    return download_open_access(doi, output_dir=output_dir, delay_range=delay_range, log=log)
+
+def extract_pdf_url(html):
+    """
+    Find the PDF link on a Sci-Hub page.
+    Takes the raw response bytes so the parser detects the encoding itself,
+    instead of decoding response.text first.
+    Returns the link as found in the page, or None.
+    """
+    tree = HTMLParser(html)
+    for selector, attribute in PDF_LINK_SELECTORS:
+        # Skip matches whose attribute is empty, e.g. <a href="">
+        for node in tree.css(selector):
+            if node.attributes.get(attribute):
+                return node.attributes[attribute]
+    return None
+
+def download_paper(doi, output_dir="papers", sci_hub_url="https://sci-hub.box/", delay_range=(3, 7), log=st.write):
     """
     Download a paper from Sci-Hub using its DOI.
     """
-    if not os.path.exists(output_dir):
-        os.makedirs(output_dir)
+    os.makedirs(output_dir, exist_ok=True)
     
-    doi = doi.strip()
-    if doi.startswith('https://doi.org/'):
-        doi = doi.replace('https://doi.org/', '')
+    doi = normalize_doi(doi)
     
     url = f"{sci_hub_url}{doi}"
     
@@ -71,43 +256,16 @@ def download_paper(doi, output_dir="papers", sci_hub_url="https://sci-hub.box/")
         headers = {
             'User-Agent': random.choice(USER_AGENTS)
         }
-        response = fetch_with_bypass(url, headers)
+        response = fetch_with_bypass(url, headers, delay_range=delay_range, log=log)
         
         if response.status_code != 200:
-            st.write(f"Failed to access Sci-Hub for DOI: {doi}. Status code: {response.status_code}")
+            log(f"Failed to access Sci-Hub for DOI: {doi}. Status code: {response.status_code}")
             return False
         
-        soup = BeautifulSoup(response.text, 'html.parser')
-        pdf_url = None
-        
-        # Try different methods to find the PDF link
-        iframe = soup.find('iframe')
-        if iframe and iframe.get('src'):
-            pdf_url = iframe.get('src')
-        
-        if not pdf_url:
-            embed = soup.find('embed')
-            if embed and embed.get('src'):
-                pdf_url = embed.get('src')
+        pdf_url = extract_pdf_url(response.content)
         
         if not pdf_url:
-            buttons = soup.find_all('a')
-            for button in buttons:
-                if button.get('href') and button.get('href').endswith('.pdf'):
-                    pdf_url = button.get('href')
-                    break
-        
-        if not pdf_url:
-            download_div = soup.find('div', id='download')
-            if download_div:
-                links = download_div.find_all('a')
-                for link in links:
-                    if link.get('href'):
-                        pdf_url = link.get('href')
-                        break
-        
-        if not pdf_url:
-            st.write(f"No PDF found for DOI: {doi}")
+            log(f"No PDF found for DOI: {doi}")
             return False
         
         # Handle relative URLs
@@ -118,50 +276,69 @@ def download_paper(doi, output_dir="papers", sci_hub_url="https://sci-hub.box/")
             base_url = f"{parsed_url.scheme}://{parsed_url.netloc}"
             pdf_url = base_url + pdf_url if pdf_url.startswith('/') else base_url + '/' + pdf_url
         
-        st.write(f"Downloading PDF from: {pdf_url}")
-        pdf_response = fetch_with_bypass(pdf_url, headers)
-        
-        if pdf_response.status_code != 200:
-            st.write(f"Failed to download PDF for DOI: {doi}. Status code: {pdf_response.status_code}")
-            return False
-        
-        content_type = pdf_response.headers.get('Content-Type', '')
-        if 'application/pdf' not in content_type and not pdf_url.endswith('.pdf'):
-            st.write(f"Warning: Content may not be a PDF for DOI: {doi}.")
-        
-        safe_doi = doi.replace('/', '_').replace('\\', '_')
-        filename = os.path.join(output_dir, f"{safe_doi}.pdf")
-        
-        with open(filename, 'wb') as f:
-            f.write(pdf_response.content)
-        
-        if os.path.getsize(filename) < 10000:
-            st.write(f"Warning: Downloaded file for DOI {doi} is very small ({os.path.getsize(filename)} bytes)")
-            with open(filename, 'rb') as f:
-                content_start = f.read(1000).decode('utf-8', errors='ignore')
-                if '<html' in content_start.lower() or '<!doctype html' in content_start.lower():
-                    st.write("Error: Downloaded file appears to be HTML, not a PDF")
-                    os.remove(filename)
+        log(f"Downloading PDF from: {pdf_url}")
+        pdf_response = fetch_with_bypass(pdf_url, headers, stream=True, delay_range=delay_range, log=log)
+        try:
+            if pdf_response.status_code != 200:
+                log(f"Failed to download PDF for DOI: {doi}. Status code: {pdf_response.status_code}")
+                return False
+            
+            content_type = pdf_response.headers.get('Content-Type', '')
+            if 'application/pdf' not in content_type and not pdf_url.endswith('.pdf'):
+                log(f"Warning: Content may not be a PDF for DOI: {doi}.")
+            
+            filename = pdf_filename(output_dir, doi)
+            
+            # Check the start of the body before anything is written, so an
+            # HTML error page is rejected without downloading the rest of it
+            chunks = pdf_response.iter_bytes(DOWNLOAD_CHUNK_SIZE)
+            content_start = next(chunks, b'')
+            if b'%PDF-' not in content_start[:1000]:
+                lowered = content_start[:1000].lower()
+                if b'<html' in lowered or b'<!doctype' in lowered:
+                    log("Error: Downloaded file appears to be HTML, not a PDF")
                     return False
+                log(f"Warning: Downloaded file for DOI {doi} does not start with a PDF header.")
+            
+            size = len(content_start)
+            partial = filename + PARTIAL_SUFFIX
+            try:
+                with open(partial, 'wb') as f:
+                    f.write(content_start)
+                    for chunk in chunks:
+                        f.write(chunk)
+                        size += len(chunk)
+                os.replace(partial, filename)
+            except Exception:
+                # Don't leave a truncated download behind
+                with suppress(OSError):
+                    os.remove(partial)
+                raise
+        finally:
+            pdf_response.close()
         
-        st.write(f"**Successfully downloaded:** `{filename}`")
+        if size < 10000:
+            log(f"Warning: Downloaded file for DOI {doi} is very small ({size} bytes)")
+        
+        log(f"**Successfully downloaded:** `{filename}`")
         return True
     
     except Exception as e:
-        st.write(f"Error downloading paper with DOI {doi}: {str(e)}")
+        log(f"Error downloading paper with DOI {doi}: {str(e)}")
         return False
 
-def download_open_access(doi, output_dir="papers", email="example@example.com"):
+def download_open_access(doi, output_dir="papers", email="example@example.com", delay_range=(3, 7), log=st.write):
     """
     Attempt to download an open access version of the paper using the Unpaywall API.
     """
+    doi = normalize_doi(doi)
     api_url = f"https://api.unpaywall.org/v2/{doi}?email={email}"
     try:
-        res = requests.get(api_url, timeout=30)
+        res = get_with_backoff(api_url, delay_range=delay_range, log=log)
         if res.status_code != 200:
-            st.write(f"Unpaywall request failed for DOI: {doi}. Status code: {res.status_code}")
+            log(f"Unpaywall request failed for DOI: {doi}. Status code: {res.status_code}")
             return False
-        data = res.json()
+        data = orjson.loads(res.content)
         pdf_url = None
         if data.get("best_oa_location") and data["best_oa_location"].get("url_for_pdf"):
             pdf_url = data["best_oa_location"]["url_for_pdf"]
@@ -171,64 +348,145 @@ def download_open_access(doi, output_dir="papers", email="example@example.com"):
                     pdf_url = loc["url_for_pdf"]
                     break
         if not pdf_url:
-            st.write(f"No open access PDF found for DOI: {doi}")
+            log(f"No open access PDF found for DOI: {doi}")
             return False
 
         headers = {
             'User-Agent': random.choice(USER_AGENTS)
         }
-        pdf_response = fetch_with_bypass(pdf_url, headers)
-        if pdf_response.status_code != 200:
-            st.write(f"Failed to download OA PDF for DOI: {doi}. Status code: {pdf_response.status_code}")
-            return False
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        safe_doi = doi.replace('/', '_').replace('\\', '_')
-        filename = os.path.join(output_dir, f"{safe_doi}.pdf")
-        with open(filename, 'wb') as f:
-            f.write(pdf_response.content)
-        st.write(f"**Successfully downloaded OA PDF:** `{filename}`")
+        pdf_response = fetch_with_bypass(pdf_url, headers, stream=True, delay_range=delay_range, log=log)
+        try:
+            if pdf_response.status_code != 200:
+                log(f"Failed to download OA PDF for DOI: {doi}. Status code: {pdf_response.status_code}")
+                return False
+            os.makedirs(output_dir, exist_ok=True)
+            filename = pdf_filename(output_dir, doi)
+            partial = filename + PARTIAL_SUFFIX
+            try:
+                with open(partial, 'wb') as f:
+                    for chunk in pdf_response.iter_bytes(DOWNLOAD_CHUNK_SIZE):
+                        f.write(chunk)
+                os.replace(partial, filename)
+            except Exception:
+                # Don't leave a truncated download behind
+                with suppress(OSError):
+                    os.remove(partial)
+                raise
+        finally:
+            pdf_response.close()
+        log(f"**Successfully downloaded OA PDF:** `{filename}`")
         return True
     except Exception as e:
-        st.write(f"Error downloading OA paper with DOI {doi}: {str(e)}")
+        log(f"Error downloading OA paper with DOI {doi}: {str(e)}")
         return False
 
-def batch_download(doi_list, mirrors, output_dir="papers", delay_range=(3, 7)):
+def batch_download(doi_list, mirrors, output_dir="papers", delay_range=(3, 7), max_workers=MAX_WORKERS):
     """
     Download multiple papers from Sci-Hub using their DOIs and a list of mirrors.
+    Up to `max_workers` DOIs are processed concurrently in a thread pool;
+    each worker collects its messages and the main thread writes them once
+    the DOI is finished, since Streamlit elements can only be created from
+    the script thread.
+    Each DOI's messages go into a single collapsed expander.
+    DOIs are normalised and duplicates dropped, and DOIs whose PDF is
+    already in `output_dir` (e.g. from an earlier, partly successful run)
+    are counted as successful without downloading them again.
     Returns (successful_dois, failed_dois).
     """
     successful_dois = []
     failed_dois = []
+    # Deduplicate on the normalised DOI, since that is what the file name
+    # is built from; two spellings of one DOI must not download concurrently
+    doi_list = list(dict.fromkeys(normalize_doi(doi) for doi in doi_list))
 
     progress_bar = st.progress(0)
-    
-    for i, doi in enumerate(doi_list):
-        with st.spinner(f"Processing {i+1}/{len(doi_list)}: {doi}..."):
-            st.write("---")
-            st.write(f"**DOI {i+1}/{len(doi_list)}:** `{doi}`")
-            success = try_download_with_mirrors(doi, mirrors, output_dir=output_dir, delay_range=delay_range)
-            if success:
-                successful_dois.append(doi)
-            else:
-                failed_dois.append(doi)
-        progress_bar.progress(int((i+1)/len(doi_list)*100))
+    # Redraw the progress bar at most ~100 times regardless of batch size
+    progress_step = max(1, len(doi_list) // 100)
+
+    def process(doi):
+        filename = pdf_filename(output_dir, doi)
+        if os.path.exists(filename) and os.path.getsize(filename) > 10000:
+            return True, [f"**Already downloaded:** `{filename}`"]
+        lines = []
+        success = try_download_with_mirrors(
+            doi, mirrors, output_dir=output_dir, delay_range=delay_range, log=lines.append
+        )
+        return success, lines
+
+    with st.spinner(f"Processing {len(doi_list)} DOIs..."):
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = {
+                executor.submit(process, doi): (index, doi) for index, doi in enumerate(doi_list)
+            }
+            try:
+                # `index` is the DOI's position in the input; `done` counts
+                # completed DOIs for the progress bar
+                for done, future in enumerate(as_completed(futures), start=1):
+                    index, doi = futures[future]
+                    try:
+                        success, lines = future.result()
+                    except Exception as e:
+                        success, lines = False, [f"Error processing DOI {doi}: {str(e)}"]
+                    status = "downloaded" if success else "failed"
+                    with st.expander(f"DOI {index+1}/{len(doi_list)}: {doi} ({status})"):
+                        st.markdown("\n\n".join(lines))
+                    if success:
+                        successful_dois.append(doi)
+                    else:
+                        failed_dois.append(doi)
+                    if done % progress_step == 0 or done == len(doi_list):
+                        progress_bar.progress(int(done/len(doi_list)*100))
+            except BaseException:
+                # Stop/Reset interrupts the script here; drop the DOIs that
+                # have not started rather than waiting for all of them
+                executor.shutdown(wait=False, cancel_futures=True)
+                raise
     
     return successful_dois, failed_dois
 
 def zip_papers(output_dir="papers"):
     """
-    Create a zip archive of the downloaded PDFs.
-    Returns the bytes of the zip file.
+    Create a zip archive of the downloaded PDFs on disk.
+    Each call writes a new temporary file, so sessions never share or
+    overwrite each other's archive.
+    PDFs are already compressed internally, so they are stored rather than
+    deflated again.
+    Returns the path of the zip file.
     """
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zip_file:
+    fd, archive_path = tempfile.mkstemp(prefix="papers_", suffix=".zip")
+    os.close(fd)
+    with zipfile.ZipFile(archive_path, "w", zipfile.ZIP_STORED) as zip_file:
         for foldername, subfolders, filenames in os.walk(output_dir):
             for filename in filenames:
+                # Skip downloads left unfinished by an interrupted run
+                if filename.endswith(PARTIAL_SUFFIX):
+                    continue
                 file_path = os.path.join(foldername, filename)
                 zip_file.write(file_path, arcname=filename)
-    zip_buffer.seek(0)
-    return zip_buffer
+    return archive_path
+
+@st.cache_data
+def parse_doi_file(raw_bytes):
+    """
+    Extract the comma-separated DOIs from an uploaded file's bytes.
+    """
+    content = raw_bytes.decode("utf-8")
+    return [doi.strip().strip('"') for doi in content.split(",") if doi.strip()]
+
+@st.cache_data
+def dedupe_mirrors(selected, custom):
+    """
+    Combine the selected default mirrors with the custom mirrors text
+    (one per line), keeping the first occurrence of each.
+    """
+    custom_list = [mirror.strip() for mirror in custom.splitlines() if mirror.strip()]
+    return list(dict.fromkeys(selected + custom_list))
+
+def remove_archive(zip_path):
+    """Delete an archive created by zip_papers, if there is one."""
+    if zip_path:
+        with suppress(OSError):
+            os.remove(zip_path)
 
 def failed_dois_file(failed_list):
     """
@@ -247,7 +505,7 @@ def main():
         You can choose default Sci-Hub mirrors or add your own.
         
         **Process:**  
-        1. Each DOI is tried against all provided mirrors sequentially.  
+        1. Several DOIs are processed in parallel; each is tried against every provided mirror, starting with whichever has capacity free.  
         2. If one mirror fails, the next is tried automatically.  
         3. Downloaded PDFs are zipped for easy download.  
         4. A separate file lists DOIs for which downloads failed.
@@ -257,7 +515,8 @@ def main():
     # Reset button: Clear previous downloads and restart the app
     if st.button("Reset / Start New Process"):
         clear_papers_directory("papers")
-        for key in ["zip_buffer", "failed_buffer", "download_summary", "total_dois", "success_count", "failed_count"]:
+        remove_archive(st.session_state.get("zip_path"))
+        for key in ["zip_path", "failed_buffer", "download_summary", "total_dois", "success_count", "failed_count"]:
             if key in st.session_state:
                 del st.session_state[key]
         try:
@@ -277,23 +536,22 @@ def main():
     st.subheader("Select or Add Sci-Hub Mirrors")
     selected_defaults = st.multiselect("Choose default Sci-Hub mirrors", default_mirrors, default=default_mirrors)
     custom_mirrors = st.text_area("Or add custom Sci-Hub mirrors (one per line)", value="")
-    custom_mirrors_list = [mirror.strip() for mirror in custom_mirrors.splitlines() if mirror.strip()]
 
     # Combine and deduplicate mirrors, then enforce a maximum of three
-    all_mirrors = list(dict.fromkeys(selected_defaults + custom_mirrors_list))
+    all_mirrors = dedupe_mirrors(selected_defaults, custom_mirrors)
     if not all_mirrors:
         all_mirrors = default_mirrors
     if len(all_mirrors) > 3:
         st.warning("Only the first three mirrors will be used.")
         all_mirrors = all_mirrors[:3]
     
-    delay_range = st.slider("Select delay range between requests (in seconds)", 1, 10, (3, 7))
+    delay_range = st.slider("Select backoff delay range when a server rate-limits requests (in seconds)", 1, 10, (3, 7))
+    max_workers = st.slider("Number of DOIs to download in parallel", 1, MAX_WORKERS_LIMIT, MAX_WORKERS)
     
     if st.button("Download Papers"):
         if uploaded_file is not None:
             try:
-                content = uploaded_file.read().decode("utf-8")
-                doi_list = [doi.strip().strip('"') for doi in content.split(",") if doi.strip()]
+                doi_list = parse_doi_file(uploaded_file.getvalue())
                 st.write(f"Found {len(doi_list)} DOIs.")
                 st.session_state.total_dois = len(doi_list)
                 
@@ -301,17 +559,22 @@ def main():
                     doi_list=doi_list,
                     mirrors=all_mirrors,
                     output_dir="papers",
-                    delay_range=delay_range
+                    delay_range=delay_range,
+                    max_workers=max_workers
                 )
                 
+                # Duplicates are only processed once
+                st.session_state.total_dois = len(successful) + len(failed)
                 st.session_state.success_count = len(successful)
                 st.session_state.failed_count = len(failed)
                 
-                # Store download buffers in session state
+                # Store the archive path and failed DOIs buffer in session state,
+                # replacing this session's previous archive
+                remove_archive(st.session_state.get("zip_path"))
                 if successful:
-                    st.session_state.zip_buffer = zip_papers()
+                    st.session_state.zip_path = zip_papers()
                 else:
-                    st.session_state.zip_buffer = None
+                    st.session_state.zip_path = None
                 
                 if failed:
                     st.session_state.failed_buffer = failed_dois_file(failed)
@@ -334,20 +597,24 @@ def main():
             st.warning("Please upload a text file with DOIs.")
     
     # Display the download buttons and summary if available in session state
-    if "zip_buffer" in st.session_state or "failed_buffer" in st.session_state:
+    if "zip_path" in st.session_state or "failed_buffer" in st.session_state:
         with st.container():
             st.write("---")
             st.subheader("Download Files")
             col1, col2 = st.columns(2)
             with col1:
-                if st.session_state.get("zip_buffer"):
-                    st.download_button(
-                        label="Download All Papers as Zip",
-                        data=st.session_state.zip_buffer,
-                        file_name="downloaded_papers.zip",
-                        mime="application/zip",
-                        key="download_zip"
-                    )
+                zip_path = st.session_state.get("zip_path")
+                if zip_path and os.path.exists(zip_path):
+                    # Only the path is kept in session state; the archive is
+                    # read from disk when the button is rendered
+                    with open(zip_path, "rb") as zip_file:
+                        st.download_button(
+                            label="Download All Papers as Zip",
+                            data=zip_file,
+                            file_name="downloaded_papers.zip",
+                            mime="application/zip",
+                            key="download_zip"
+                        )
                 else:
                     st.info("No successful downloads available.")
             with col2:
@@ -369,7 +636,7 @@ def main():
             st.markdown(st.session_state.download_summary)
     
     # Celebratory animation if there are successful downloads
-    if st.session_state.get("zip_buffer"):
+    if st.session_state.get("zip_path"):
         st.balloons()
 
 if __name__ == "__main__":